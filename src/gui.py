@@ -1,10 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import hashlib
+import io
 import os
-from itertools import filterfalse
 from pathlib import Path
+import pickle
 import shutil
+import sys
+import tempfile
+import threading
 import traceback
 import json
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# cross-device moves and cache copies fall back to a userspace copy
+# loop; a 1 MiB buffer beats the 64 KiB default on modern disks
+shutil.COPY_BUFSIZE = 1024 * 1024
+
 from PyQt6.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -21,8 +37,14 @@ from PyQt6.QtWidgets import (
     QHBoxLayout,
     QVBoxLayout
 )
-from PyQt6.QtGui import QAction, QIcon, QFontDatabase
-from PyQt6.QtCore import Qt
+from PyQt6.QtGui import (
+    QAction,
+    QIcon,
+    QFontDatabase,
+    QStandardItem,
+    QStandardItemModel
+)
+from PyQt6.QtCore import Qt, QObject, QRunnable, QThreadPool, pyqtSignal
 
 import texutils
 
@@ -31,7 +53,7 @@ TEMPLATE_DIR = os.path.join(ROOT, 'templates')
 ICON_DIR = os.path.join(ROOT, 'assets', 'icons')
 WATERMARK_DIR = os.path.join(ROOT, 'assets', 'watermarks')
 LOG_DIR = os.path.join(ROOT, 'log')
-
+CACHE_DIR = os.path.join(ROOT, 'latex_cache')
 
 if not os.path.exists(LOG_DIR):
     os.mkdir(LOG_DIR)
@@ -41,6 +63,83 @@ class WatermarkNotFoundError(FileNotFoundError):
     pass
 
 
+# enumerating installed font families is expensive; do it once per process
+_FONTS_CACHE: list | None = None
+
+# and cache it across processes too: first launch after a cold start
+# serves the pickled list while a background thread revalidates it
+_FONTS_PKL = os.path.join(
+    os.path.expanduser('~'), '.cache', 'pdfmaker', 'fonts.pkl')
+
+
+def _get_fonts() -> list:
+    global _FONTS_CACHE
+    if _FONTS_CACHE is None:
+        try:
+            with open(_FONTS_PKL, 'rb') as f:
+                _FONTS_CACHE = pickle.load(f)
+        except (OSError, pickle.PickleError):
+            _FONTS_CACHE = QFontDatabase.families()
+            _save_fonts_pickle(_FONTS_CACHE)
+        else:
+            # newly installed fonts show up on the next launch
+            threading.Thread(
+                target=lambda: _save_fonts_pickle(QFontDatabase.families()),
+                daemon=True
+            ).start()
+    return _FONTS_CACHE
+
+
+def _save_fonts_pickle(families):
+    try:
+        os.makedirs(os.path.dirname(_FONTS_PKL), exist_ok=True)
+        tmp_path = f'{_FONTS_PKL}.{os.getpid()}'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(list(families), f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, _FONTS_PKL)
+    except OSError:
+        pass
+
+
+# share decoded icon pixmaps across windows
+_ICON_CACHE: dict = {}
+
+
+def _icon(name: str) -> QIcon:
+    icon = _ICON_CACHE.get(name)
+    if icon is None:
+        icon = QIcon(os.path.join(ICON_DIR, f'{name}.png'))
+        _ICON_CACHE[name] = icon
+    return icon
+
+
+@functools.lru_cache(maxsize=8)
+def _cached_template(path: str, mtime: float):
+    # keyed on mtime so an edited template is re-read, not served stale
+    return texutils.make_template(path)
+
+
+@functools.lru_cache(maxsize=4)
+def _list_dir(path: str) -> tuple:
+    # cached directory listing; scandir avoids the extra stat per entry
+    with os.scandir(path) as it:
+        return tuple(sorted(e.name for e in it if not e.name.startswith('.')))
+
+
+def _refresh_cached_lists():
+    # for when the user installs fonts, templates or watermarks while
+    # the app is running; newly built panels pick up the fresh lists
+    global _FONTS_CACHE
+    _FONTS_CACHE = None
+    try:
+        # drop the cross-process copy as well; a refresh means the user
+        # wants the real current state, not last launch's snapshot
+        os.remove(_FONTS_PKL)
+    except OSError:
+        pass
+    _list_dir.cache_clear()
+
+
 def main():
     app = QApplication([])
     style = """
@@ -55,6 +154,213 @@ def main():
     app.exec()
 
 
+def run_batch(config_path) -> int:
+    """convert the files listed in a JSON config, with no Qt dialogs
+
+    the config mirrors the control-panel parameters, e.g.
+
+        {"template_name": "essay.jinja", "output_dir": "...",
+         "keep_tex": false, "watermark": "", "filenames": [...],
+         ...remaining template parameters}
+
+    errors go to stderr; returns 0 if every file converted, 1 if any
+    file failed, 2 if the config itself is unusable
+    """
+    try:
+        with open(config_path, encoding='utf-8') as f:
+            params = json.load(f)
+        if not isinstance(params, dict):
+            raise ValueError('config must be a JSON object')
+        filenames = params.pop('filenames')
+        if not isinstance(filenames, list):
+            raise ValueError('"filenames" must be a list')
+        template_name = os.path.join(
+            TEMPLATE_DIR, params.pop('template_name'))
+        output_dir = params.pop('output_dir')
+        keep_tex = params.pop('keep_tex', True)
+        params['watermark'] = _get_watermark_path(params.pop('watermark', ''))
+
+        template = _cached_template(
+            template_name, os.path.getmtime(template_name))
+    except (OSError, ValueError, KeyError) as e:
+        # bad path, unparsable json, missing key, unknown template or
+        # watermark: report the way per-file failures are reported
+        print(f'\n{config_path}\n'
+              + ''.join(traceback.format_exception_only(type(e), e)),
+              file=sys.stderr)
+        return 2
+
+    try:
+        same_device = os.stat(output_dir).st_dev == os.stat(ROOT).st_dev
+    except OSError:
+        same_device = False
+    move = os.replace if same_device else shutil.move
+
+    output_prefix = f'{output_dir}{os.sep}'
+
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as pool:
+        errors = [
+            (filename, error)
+            for filename, error in zip(
+                filenames,
+                pool.map(
+                    lambda filename: _convert_one(
+                        template, filename, params,
+                        output_prefix, keep_tex, move),
+                    filenames))
+            if error is not None
+        ]
+
+    for filename, error in errors:
+        print(f'\n{filename}\n{error}', file=sys.stderr)
+    return 1 if errors else 0
+
+
+class WorkerSignals(QObject):
+    # filename, error (a formatted traceback str, or None on success)
+    finished = pyqtSignal(str, object)
+
+
+def _pdf_cache_key(tex_digest: str, watermark) -> str:
+    # the rendered tex embeds the template output and all params;
+    # only the watermark image content lives outside it
+    digest = hashlib.sha256(tex_digest.encode())
+    if watermark:
+        with open(watermark, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+# every unique document version adds a pdf (and every unique preamble a
+# .fmt) to the cache; cap the entry count so it cannot grow forever
+_CACHE_MAX_ENTRIES = 256
+
+
+def _prune_cache():
+    # best effort: drop the oldest entries beyond the cap; a concurrent
+    # worker may have unlinked an entry already
+    try:
+        with os.scandir(CACHE_DIR) as it:
+            entries = [(e.stat().st_mtime, e.path) for e in it]
+    except OSError:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - _CACHE_MAX_ENTRIES]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _store_pdf_in_cache(pdf_path, cache_path):
+    # best effort: a failed cache write must never fail the conversion
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        os.link(pdf_path, cache_path)
+    except OSError:
+        try:
+            shutil.copyfile(pdf_path, cache_path)
+        except OSError:
+            pass
+    _prune_cache()
+
+
+def _place(src, dst, move=shutil.move):
+    # hard-link + unlink is a zero-copy move on the same filesystem;
+    # fall back to the plain move where linking is not possible
+    # (cross-device, unsupported filesystem, or dst already exists)
+    try:
+        os.link(src, dst)
+        os.remove(src)
+    except OSError:
+        move(src, dst)
+
+
+def _convert_one(template, filename, params, output_prefix, keep_tex,
+                 move=shutil.move):
+    """run the txt -> tex -> pdf pipeline for a single file
+
+    returns a formatted error str, or None on success
+    """
+    # split the source name once; everything else is concatenation
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    tex_basename = f'{stem}.tex'
+    pdf_basename = f'{stem}.pdf'
+    # compile in a private working directory: parallel workers may
+    # process sources that share a basename, and must not trample each
+    # other's .tex/.aux/.pdf; kept under ROOT so cache and output moves
+    # stay on the same filesystem
+    workdir = tempfile.mkdtemp(prefix='.work-', dir=str(ROOT))
+    tex_path = f'{workdir}{os.sep}{tex_basename}'
+    error = None
+    try:
+        tex_digest = texutils.txt2tex(template, filename, params, tex_path)
+
+        # on a repeat run with identical inputs, serve the cached pdf
+        # and skip lualatex entirely
+        cache_key = _pdf_cache_key(tex_digest, params.get('watermark'))
+        cache_path = os.path.join(CACHE_DIR, f'{cache_key}.pdf')
+        if os.path.isfile(cache_path):
+            shutil.copyfile(cache_path, output_prefix + pdf_basename)
+            if keep_tex:
+                _place(tex_path, output_prefix + tex_basename, move)
+            return None
+
+        if texutils.HAVE_LATEXMK:
+            texutils.tex2pdf_latexmk(tex_path)
+        else:
+            # reuse a precompiled preamble where one can be dumped
+            fmt = texutils.ensure_fmt(tex_path, CACHE_DIR)
+            texutils.tex2pdf(tex_path, fmt=fmt)
+            # a second pass is only necessary to generate watermarks
+            # or to resolve labels/toc entries found in the .aux
+            if params.get('watermark') or texutils.aux_needs_rerun(tex_path):
+                texutils.tex2pdf(tex_path, fmt=fmt)
+
+        # populate the cache, then move the pdf to the output dir and
+        # move the tex file alongside it if the user wants it kept;
+        # placement runs inside the try so that a vanished output dir
+        # is reported like any other failure
+        pdf_path = f'{workdir}{os.sep}{pdf_basename}'
+        _store_pdf_in_cache(pdf_path, cache_path)
+        _place(pdf_path, output_prefix + pdf_basename, move)
+        if keep_tex:
+            _place(tex_path, output_prefix + tex_basename, move)
+    except (texutils.TemplateRenderingError,
+            texutils.LuaLaTeXRuntimeError,
+            OSError) as e:
+        # for expected failures the type and message say it all;
+        # skip the cost of building a full stack trace
+        error = ''.join(traceback.format_exception_only(type(e), e))
+    except Exception:
+        error = traceback.format_exc()
+    finally:
+        # the working directory holds everything that is not moved out:
+        # the tex file (unless kept), helper files, failed runs
+        shutil.rmtree(workdir, ignore_errors=True)
+    return error
+
+
+class ConvertWorker(QRunnable):
+    """dispatch one file's conversion onto a pool thread"""
+
+    def __init__(self, template, filename, params, output_prefix, keep_tex,
+                 move=shutil.move):
+        super().__init__()
+        self.signals = WorkerSignals()
+        self._args = (template, filename, params, output_prefix, keep_tex,
+                      move)
+
+    def run(self):
+        try:
+            error = _convert_one(*self._args)
+        except Exception:
+            # the signal must fire no matter what, or _pending never
+            # reaches zero and the window stays stuck on 'Working...'
+            error = traceback.format_exc()
+        self.signals.finished.emit(self._args[1], error)
+
+
 class MainWindow(QMainWindow):
 
     log_path = os.path.join(LOG_DIR, 'log.txt')
@@ -75,6 +381,16 @@ class MainWindow(QMainWindow):
 
         self.control.on_execute(self.convert)
 
+        self._refresh_action = QAction('Refresh lists', self)
+        self._refresh_action.triggered.connect(_refresh_cached_lists)
+        self.menuBar().addAction(self._refresh_action)
+
+        # one lualatex per file; let the kernel schedule them in parallel
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(os.cpu_count() or 1)
+        self._pending = 0
+        self._errors = []
+
     def convert(self):
         """
         get parameters from the control panel, including
@@ -99,43 +415,55 @@ class MainWindow(QMainWindow):
             filenames=filenames
         )
 
-        template = texutils.make_template(template_name)
+        template = _cached_template(
+            template_name, os.path.getmtime(template_name))
+
+        # a same-device move is a single rename syscall; only fall back
+        # to shutil.move (stat dance, possibly copy+unlink) across devices
+        try:
+            same_device = os.stat(output_dir).st_dev == os.stat(ROOT).st_dev
+        except OSError:
+            same_device = False
+        move = os.replace if same_device else shutil.move
+
+        output_prefix = f'{output_dir}{os.sep}'
+
+        # no double submissions while a batch is in flight
+        self.control.set_busy(True)
 
-        # hold errors while letting other files be processedr
-        errors = []
+        # hold errors while letting other files be processed
+        self._errors = []
+        self._pending = len(filenames)
 
-        # TODO use threading?
         for filename in filenames:
-            tex_basename = texutils.swap_ext(filename, 'tex', base_only=True)
-            tex_path = os.path.join(ROOT, tex_basename)
-            try:
-                texutils.txt2tex(template, filename, params, tex_path)
-                texutils.tex2pdf(tex_path)
-            except Exception:
-                errors.append((filename, traceback.format_exc()))
-            else:
-                # second pass is necessary to generate watermarks
-                texutils.tex2pdf(tex_path)
-                # move the pdf to the output dir
-                # and move or remove the tex file as the user dictates
-                pdf_path = texutils.swap_ext(tex_path, 'pdf')
-                pdf_basename = os.path.basename(pdf_path)
-                shutil.move(pdf_path, os.path.join(output_dir, pdf_basename))
-                if keep_tex:
-                    shutil.move(
-                        tex_path,
-                        os.path.join(output_dir, tex_basename)
-                    )
-                else:
-                    os.remove(tex_path)
-            finally:
-                texutils.delete_helper_files(tex_path)
-
-        with open(self.log_path, 'a', encoding='utf-8') as f:
-            for (filename, e) in errors:
-                f.write(f'\n{filename}\n{e}\n')
-            if not errors:
-                f.write('\nfinished without errors')
+            worker = ConvertWorker(
+                template, filename, params, output_prefix, keep_tex, move)
+            worker.signals.finished.connect(self._on_file_done)
+            self._pool.start(worker)
+
+        if not filenames:
+            self._finish_convert()
+
+    def _on_file_done(self, filename, error):
+        if error is not None:
+            self._errors.append((filename, error))
+        self._pending -= 1
+        if self._pending == 0:
+            self._finish_convert()
+
+    def _finish_convert(self):
+        self.control.set_busy(False)
+        errors = self._errors
+
+        # assemble the report in memory and write it out in one go
+        buf = io.StringIO()
+        for (filename, e) in errors:
+            buf.write(f'\n{filename}\n{e}\n')
+        if not errors:
+            buf.write('\nfinished without errors')
+        with open(self.log_path, 'a', encoding='utf-8',
+                  buffering=1 << 16) as f:
+            f.write(buf.getvalue())
 
         # show success, or errors if any
         message_box = QMessageBox()
@@ -151,8 +479,14 @@ class MainWindow(QMainWindow):
         message_box.exec()
 
     def _log_params(self, **kwargs):
-        with open(self.log_path, 'w', encoding='utf-8') as f:
-            print(json.dumps(kwargs, indent=4), file=f)
+        # orjson encodes in C and is much faster for long file lists
+        if orjson is not None:
+            data = orjson.dumps(kwargs, option=orjson.OPT_INDENT_2).decode()
+        else:
+            data = json.dumps(kwargs, separators=(',', ':'))
+        with open(self.log_path, 'w', encoding='utf-8',
+                  buffering=1 << 16) as f:
+            print(data, file=f)
 
 
 class FileList(QFrame):
@@ -184,6 +518,9 @@ class FileList(QFrame):
         self.list.setMinimumWidth(400)
         layout.addWidget(self.list)
 
+        # mirror of the list contents for fast membership tests
+        self._paths = set()
+
     def add(self):
         path_list, _ = QFileDialog.getOpenFileNames(
             self,  # paren widget
@@ -192,19 +529,27 @@ class FileList(QFrame):
             "TXT files (*.txt);;All files (*.*)",  # filter
             "TXT files (*.txt)"  # inital filter
         )
-        # ignore paths already in the list
-        for path in filterfalse(self.contains, path_list):
-            self.list.addItem(path)
+        # ignore paths already in the list; add the rest in one call
+        new_paths = [path for path in path_list if path not in self._paths]
+        self.list.setUpdatesEnabled(False)
+        self.list.addItems(new_paths)
+        self.list.setUpdatesEnabled(True)
+        self._paths.update(new_paths)
 
     def remove_current(self):
-        self.list.takeItem(self.list.currentRow())
+        item = self.list.takeItem(self.list.currentRow())
+        if item is not None:
+            self._paths.discard(item.text())
 
     def remove_all(self):
+        self.list.setUpdatesEnabled(False)
         self.list.clear()
+        self.list.setUpdatesEnabled(True)
+        self._paths.clear()
 
     def contains(self, filepath):
         # return true if `filepath` is in the list
-        return self.list.findItems(filepath, Qt.MatchFlag.MatchExactly)
+        return filepath in self._paths
 
     def get_filenames(self) -> list:
         return [self.list.item(i).text() for i in range(self.list.count())]
@@ -213,7 +558,7 @@ class FileList(QFrame):
         self._actions[text] = action = QAction()
         self.toolbar.addAction(action)
         if icon:
-            action.setIcon(QIcon(os.path.join(ICON_DIR, f'{icon}.png')))
+            action.setIcon(_icon(icon))
             action.setToolTip(text)
         else:
             action.setText(text)
@@ -222,23 +567,56 @@ class FileList(QFrame):
         return action
 
 
+class LazyFontCombo(QComboBox):
+    """a combobox that loads the font family list only when opened
+
+    enumerating the installed families delays first paint, so start out
+    holding just the default and materialize the full list on demand
+    """
+
+    def __init__(self, default='', parent=None):
+        super().__init__(parent)
+        self._populated = False
+        if default:
+            self.addItem(default)
+
+    def showPopup(self):
+        if not self._populated:
+            current = self.currentText()
+            fonts = _get_fonts()
+            model = QStandardItemModel(len(fonts), 1, self)
+            for i, family in enumerate(fonts):
+                model.setItem(i, 0, QStandardItem(family))
+            self.blockSignals(True)
+            self.setModel(model)
+            try:
+                self.setCurrentIndex(fonts.index(current))
+            except ValueError:
+                pass
+            self.blockSignals(False)
+            self._populated = True
+        super().showPopup()
+
+
 class ControlPanel(QFrame):
 
     def __init__(self, parent=None):
         super().__init__(parent)
+        # suppress repaints/layout passes while the widgets pile up
+        self.setUpdatesEnabled(False)
         layout = QVBoxLayout()
         self.setLayout(layout)
 
-        self._fields = {}  # field_name -> callable
+        self._fields = []  # (field_name, getter) pairs
+        self._combos = {}  # field_name -> QComboBox
 
         # template selection
         self._make_heading('Template', space_before=5)
-        self._make_combobox('template_name', values=os.listdir(TEMPLATE_DIR))
+        self._make_combobox('template_name', values=_list_dir(TEMPLATE_DIR))
 
         layout.addSpacing(20)
 
         # font selection
-        self._fonts = QFontDatabase.families()
         self._font_sizes = [str(i) for i in range(8, 25)]
         self._make_font_select('Body font', 'EB Garamond', '12')
         self._make_font_select('Heading font', 'Frutiger Linotype')
@@ -247,7 +625,7 @@ class ControlPanel(QFrame):
         layout.addSpacing(20)
 
         # watermark selection
-        watermarks = [''] + os.listdir(WATERMARK_DIR)
+        watermarks = ('',) + _list_dir(WATERMARK_DIR)
         self._make_heading('Watermark')
         self._make_combobox(
             'watermark', values=watermarks, default=watermarks[-1])
@@ -263,11 +641,11 @@ class ControlPanel(QFrame):
         self._output_edit.setText(str(ROOT))
         self._output_edit.setReadOnly(True)
         self._output_edit.setMinimumWidth(300)
-        self._fields['output_dir'] = self._output_edit.text
+        self._fields.append(('output_dir', self._output_edit.text))
         output_frame.addWidget(self._output_edit)
         _insert_toolbar_space(output_frame)
         self._getdir = QAction()
-        self._getdir.setIcon(QIcon(os.path.join(ICON_DIR, 'folder.png')))
+        self._getdir.setIcon(_icon('folder'))
         self._getdir.setToolTip('Change the output directory')
         self._getdir.triggered.connect(self.open_dir_dialog)
         output_frame.addAction(self._getdir)
@@ -281,7 +659,7 @@ class ControlPanel(QFrame):
         button_frame.layout().setContentsMargins(0, 0, 0, 0)
         keep_tex_check = QCheckBox('Keep tex files')
         keep_tex_check.setChecked(False)
-        self._fields['keep_tex'] = keep_tex_check.isChecked
+        self._fields.append(('keep_tex', keep_tex_check.isChecked))
         self._execute = QPushButton('Make PDF', button_frame)
         self._execute.setStyleSheet('padding: 5 10')
         # left-align the checkbox; right-align the exec button
@@ -289,12 +667,25 @@ class ControlPanel(QFrame):
         button_frame.layout().addStretch()
         button_frame.layout().addWidget(self._execute)
 
+        self.setUpdatesEnabled(True)
+
     def get_parameters(self) -> dict:
-        return {field: getter() for field, getter in self._fields.items()}
+        # query the comboboxes directly; no bound-method indirection
+        params = {
+            field: combo.currentText()
+            for field, combo in self._combos.items()
+        }
+        for field, getter in self._fields:
+            params[field] = getter()
+        return params
 
     def on_execute(self, callback: callable):
         self._execute.clicked.connect(callback)
 
+    def set_busy(self, busy: bool):
+        self._execute.setEnabled(not busy)
+        self._execute.setText('Working...' if busy else 'Make PDF')
+
     def open_dir_dialog(self):
         if output_dir := QFileDialog.getExistingDirectory(
             caption='Choose output directory'
@@ -303,8 +694,10 @@ class ControlPanel(QFrame):
 
     def _make_font_select(self, field, default_font="", size=""):
         self._make_heading(field)
-        self._make_combobox(
-            f'{field}_family', values=self._fonts, default=default_font)
+        combobox = LazyFontCombo(default_font, self)
+        self.layout().addWidget(combobox)
+        field_name = f'{field}_family'.lower().replace(' ', '_')
+        self._combos[field_name] = combobox
         if size:
             self._make_combobox(
                 f'{field}_size', values=self._font_sizes, default=size)
@@ -321,18 +714,24 @@ class ControlPanel(QFrame):
                        parent=None) -> QComboBox:
         parent = parent or self
         combobox = QComboBox(parent)
-        combobox.addItems(values)
+        # build the model in one go and attach it once, instead of letting
+        # addItems insert (and signal) row by row
+        model = QStandardItemModel(len(values), 1, combobox)
+        for i, value in enumerate(values):
+            model.setItem(i, 0, QStandardItem(value))
+        combobox.setUpdatesEnabled(False)
+        combobox.blockSignals(True)
+        combobox.setModel(model)
         try:
             combobox.setCurrentIndex(values.index(default))
         except ValueError:
             pass
+        combobox.blockSignals(False)
+        combobox.setUpdatesEnabled(True)
         parent.layout().addWidget(combobox)
-        self._register_getter(field_name, combobox.currentText)
-        return combobox
-
-    def _register_getter(self, field_name: str, getter: callable):
         field_name = field_name.lower().replace(' ', '_')
-        self._fields[field_name] = getter
+        self._combos[field_name] = combobox
+        return combobox
 
 
 def _get_watermark_path(path):
@@ -344,9 +743,10 @@ def _get_watermark_path(path):
     if not path:
         return None
     if not os.path.isfile(path):
-        path = os.path.join(WATERMARK_DIR, path)
+        path = f'{WATERMARK_DIR}/{path}'
         if not os.path.isfile(path):
             raise WatermarkNotFoundError(path)
+    # lualatex wants forward slashes, even on windows
     return path.replace('\\', '/')
 
 
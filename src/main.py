@@ -1,5 +1,15 @@
-from gui import main
+import sys
+
+import gui
 
 
 if __name__ == '__main__':
-    main()
+    # `--batch config.json` converts without showing the GUI or any
+    # dialogs, for scripted pipelines
+    if '--batch' in sys.argv:
+        arg_index = sys.argv.index('--batch') + 1
+        if arg_index >= len(sys.argv):
+            print('usage: main.py [--batch config.json]', file=sys.stderr)
+            sys.exit(2)
+        sys.exit(gui.run_batch(sys.argv[arg_index]))
+    gui.main()
@@ -1,10 +1,159 @@
+import hashlib
 import os
 import re
 import jinja2
+import shutil
 import subprocess
+import threading
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent.parent
+TEMPLATE_DIR = os.path.join(ROOT, 'templates')
+
+# prefer latexmk where available: it decides itself how many lualatex
+# runs a document needs instead of the fixed two-pass scheme
+HAVE_LATEXMK = shutil.which('latexmk') is not None
+
+# patterns used by parse_txt, compiled once so the per-block loop
+# skips the re-module cache lookup on every call
+_RE_SOFT_BREAK = re.compile(r'(\\{2}|\\par )[ ]*\r?\n')
+_RE_STYLE = re.compile(r'^(#+)')
+_RE_SEPARATOR = re.compile(r'^\s*\*+$')
+
+# escapes, annotations and hyperlinks, fused into one alternation;
+# _convert_tokens recurses into the bracketed bodies so nested markup
+# is converted the way the old sequential passes did
+_RE_TOKEN = re.compile(
+    r'~~(?P<ntext>(?:[^~]|~[^~])+)~~'
+    r'| *<<(?P<note>(?:[^>]|>[^>])+)>> *'
+    r'|\[(?P<href_label>[^]]+)\]\((?P<href_url>[^)]+)\)'
+    r'|(?P<special>[&#%$])'
+)
+
+# quotes, dashes, ellipses and whitespace, fused into one alternation;
+# the quote alternatives use lookbehinds so that a dash or whitespace
+# token consuming a space does not rob the quote of its context
+_RE_INLINE = re.compile(
+    r'(?P<open_double>(?<=[\s({])"|^")'
+    r"|(?P<open_single>(?<=[\s({])'|^')"
+    r'|(?P<mdash>\s*(?:---|—)\s*|\s+(?:-|–)\s+)'
+    r'|(?P<ndash>\s*--(?:(?=\s+[-–]\s)|\s*))'
+    r'|(?P<ellipsis>\s*(?:\.\.\.|…)(?:(?=\s+[-–]\s)|\s*))'
+    r'|(?P<ws>\s+)'
+    r'|(?P<close_double>")'
+    r'|(?P<curly_single_open>‘)'
+    r"|(?P<curly_single_close>’)"
+    r'|(?P<curly_double_open>“)'
+    r'|(?P<curly_double_close>”)'
+)
+
+# a dash token used to donate its padding space to a dash/ellipsis
+# token right behind it (the later pass consumed it); keep that output
+_RE_PAD_FIX = re.compile(r'\\(mdash|ndash) (?=\\(?:ndash|ellipsis))')
+
+_INLINE_SUBS = {
+    'open_double': '``',
+    'open_single': '`',
+    'mdash': '\\mdash ',
+    'ndash': '\\ndash ',
+    'ellipsis': '\\ellipsis ',
+    'ws': ' ',
+    'close_double': "''",
+    'curly_single_open': '`',
+    'curly_single_close': "'",
+    'curly_double_open': '``',
+    'curly_double_close': "''",
+}
+
+
+def _convert_tokens(p: str) -> str:
+    """escape special characters and convert annotations/hyperlinks"""
+    out = []
+    pos = 0
+    for m in _RE_TOKEN.finditer(p):
+        out.append(p[pos:m.start()])
+        if (ntext := m['ntext']) is not None:
+            out.append(f'\\ntext{{{_convert_tokens(ntext)}}}')
+        elif (note := m['note']) is not None:
+            out.append(f'\\note{{{_convert_tokens(note)}}} ')
+        elif (url := m['href_url']) is not None:
+            label = _convert_tokens(m['href_label'])
+            out.append(f'\\href{{{_convert_tokens(url)}}}{{{label}}}')
+        else:
+            out.append('\\' + m['special'])
+        pos = m.end()
+    out.append(p[pos:])
+    return ''.join(out)
+
+
+def _convert_emphasis(p: str) -> str:
+    """convert **bold** and *italic* markers in one left-to-right scan
+
+    A small delimiter stack handles arbitrary nesting (including
+    ***both***) without the quadratic worst case of nested regex
+    passes; unmatched markers are kept verbatim.
+    """
+    out = []
+    stack = []  # (marker, index into out where its content starts)
+    i = 0
+    while (j := p.find('*', i)) != -1:
+        out.append(p[i:j])
+        k = j
+        while k < len(p) and p[k] == '*':
+            k += 1
+        n = k - j
+        while n:
+            if stack:
+                marker, start = stack[-1]
+                if marker == '**' and n >= 2:
+                    stack.pop()
+                    out[start:] = [f'\\textbf{{{"".join(out[start:])}}}']
+                    n -= 2
+                    continue
+                if marker == '*':
+                    bold_below = any(m == '**' for m, _ in stack)
+                    if n >= 2 and bold_below and n == 2:
+                        # a ** closer with only a lone * in the way:
+                        # the stray star is literal (**a*b**); demote
+                        # it and let the loop close the nearest bold
+                        stack.pop()
+                        out.insert(start, '*')
+                        continue
+                    if n >= 2 and not bold_below:
+                        if p.find('**', k) != -1:
+                            # bold text starts inside the open italic
+                            # (*a **b** c*)
+                            stack.append(('**', len(out)))
+                            n -= 2
+                            continue
+                        # no bold closer anywhere ahead: the run ends
+                        # this italic and may start the next (*a**b*)
+                    # close the italic; with three or more stars the
+                    # remainder then closes the enclosing bold
+                    # (***x***)
+                    stack.pop()
+                    out[start:] = [f'\\emph{{{"".join(out[start:])}}}']
+                    n -= 1
+                    continue
+            if n >= 2:
+                stack.append(('**', len(out)))
+                n -= 2
+            else:
+                stack.append(('*', len(out)))
+                n -= 1
+        i = k
+    out.append(p[i:])
+    # restore unmatched markers, innermost first so earlier recorded
+    # positions stay valid
+    for marker, start in reversed(stack):
+        out.insert(start, marker)
+    return ''.join(out)
+
+
+def _convert_inline(p: str) -> str:
+    """convert quotes, dashes, ellipses; consolidate whitespace"""
+    p = _RE_INLINE.sub(lambda m: _INLINE_SUBS[m.lastgroup], p)
+    return _RE_PAD_FIX.sub(r'\\\1', p)
 
 
 class TemplateRenderingError(RuntimeError):
@@ -15,50 +164,164 @@ class LuaLaTeXRuntimeError(RuntimeError):
     pass
 
 
+# a single shared environment lets jinja2 cache compiled templates in
+# memory and persist their bytecode across runs
+_BYTECODE_CACHE_DIR = os.path.join(ROOT, '.jinja_cache')
+os.makedirs(_BYTECODE_CACHE_DIR, exist_ok=True)
+
+_ENV = jinja2.Environment(
+    loader=jinja2.FileSystemLoader(TEMPLATE_DIR),
+    trim_blocks=True,
+    lstrip_blocks=True,
+    keep_trailing_newline=True,
+    bytecode_cache=jinja2.FileSystemBytecodeCache(directory=_BYTECODE_CACHE_DIR),
+)
+
+
 def make_template(source_path):
-    env = jinja2.Environment(
-        trim_blocks=True,
-        lstrip_blocks=True,
-        keep_trailing_newline=True
-    )
-    with open(source_path, encoding='utf-8') as template_file:
-        return env.from_string(template_file.read())
+    return _ENV.get_template(os.path.basename(source_path))
 
 
 def txt2tex(template: jinja2.Template,
             source_path: str,
             params: dict,
-            target_path=None) -> None:
+            target_path=None) -> str:
     """
     take a file path (pointing to a plain text file)
     parse its content, the result being a list of tuples (blocks)
-    render a latex-ready str using the blocks and additional params
-    and then write the str into the target file
+    stream the latex-ready render of the blocks and additional params
+    into the target file, and return a sha256 hex digest of it
     """
-    with open(source_path, encoding='utf-8') as source:
-        blocks = list(parse_txt(source.read()))
+    # one read syscall plus one C-level decode; no text-io layer
+    blocks = list(parse_txt(Path(source_path).read_bytes().decode('utf-8')))
 
+    if not target_path:
+        target_name = swap_ext(source_path, 'tex')
+        target_path = os.path.join(ROOT, target_name)
+
+    # stream the render to disk chunk by chunk rather than building
+    # the whole document in memory; hash the chunks along the way so
+    # callers can still identify the output without re-reading it.
+    # each chunk is encoded exactly once, serving both the digest and
+    # the (binary-mode) write -- no incremental text-io encoder
+    digest = hashlib.sha256()
     try:
-        tex_string = template.render(blocks=blocks, **params)
+        stream = template.stream(blocks=blocks, **params)
+        stream.enable_buffering()
+        with open(target_path, 'wb') as target:
+            for chunk in stream:
+                data = chunk.encode('utf-8')
+                digest.update(data)
+                target.write(data)
     except Exception as e:
         raise TemplateRenderingError(source_path) from e
+    return digest.hexdigest()
 
-    if not target_path:
-        target_name = swap_ext(source_path, 'tex')
-        target_path = os.path.join(ROOT, target_name)
-    with open(target_path, 'w', encoding='utf-8') as target:
-        target.write(tex_string)
 
+def tex2pdf_async(source_path: str, fmt=None) -> subprocess.Popen:
+    """spawn lualatex without waiting; the caller collects the process"""
+    print(source_path)
+    args = ['lualatex', '--interaction=nonstopmode']
+    if fmt:
+        args.append(f'--fmt={fmt}')
+    args.append(os.path.basename(source_path))
+    try:
+        # tex writes jobname.pdf/.aux/.log to the process cwd, so run
+        # in the source's directory to keep everything together
+        return subprocess.Popen(
+            args, shell=False, cwd=os.path.dirname(source_path) or '.')
+    except Exception as e:
+        raise LuaLaTeXRuntimeError(source_path) from e
 
-def tex2pdf(source_path: str) -> None:
+
+def tex2pdf(source_path: str, fmt=None) -> None:
+    proc = tex2pdf_async(source_path, fmt=fmt)
+    if proc.wait() != 0:
+        raise LuaLaTeXRuntimeError(source_path)
+
+
+# format files are bound to the engine binary that dumped them; a
+# distribution upgrade must invalidate every cached .fmt, so the
+# version string goes into the cache key (queried once per process)
+_LUALATEX_VERSION = None
+
+
+def _lualatex_version() -> bytes:
+    global _LUALATEX_VERSION
+    if _LUALATEX_VERSION is None:
+        try:
+            _LUALATEX_VERSION = subprocess.run(
+                ['lualatex', '--version'],
+                shell=False,
+                check=True,
+                capture_output=True,
+            ).stdout.splitlines()[0]
+        except Exception:
+            _LUALATEX_VERSION = b''
+    return _LUALATEX_VERSION
+
+
+def ensure_fmt(tex_path: str, fmt_dir=None):
+    """precompile the document's preamble into a .fmt file
+
+    the preamble (packages, fonts, CJK setup) dominates lualatex
+    startup; dumping it once via mylatexformat.ltx and reloading the
+    dump lets every subsequent run skip straight to the body. keyed on
+    a hash of the preamble text and the engine version, so a font,
+    template or TeX-distribution change makes a new format. returns
+    the .fmt path to hand to tex2pdf, or None if
+    the dump is not possible -- callers just run without a format then.
+    """
+    try:
+        with open(tex_path, encoding='utf-8') as f:
+            preamble, sep, _ = f.read().partition('\\begin{document}')
+        if not sep:
+            return None
+        fmt_dir = os.fspath(fmt_dir or ROOT)
+        os.makedirs(fmt_dir, exist_ok=True)
+        key = hashlib.sha256(_lualatex_version() + preamble.encode())
+        name = f'preamble-{key.hexdigest()[:16]}'
+        fmt_path = os.path.join(fmt_dir, f'{name}.fmt')
+        if not os.path.isfile(fmt_path):
+            # dump under a unique jobname, then rename into place, so
+            # concurrent workers cannot clobber each other's dump
+            tmp_name = f'{name}.{os.getpid()}.{threading.get_ident()}'
+            subprocess.run(
+                [
+                    'lualatex',
+                    '-ini',
+                    '--interaction=batchmode',
+                    f'--jobname={tmp_name}',
+                    '&lualatex mylatexformat.ltx',
+                    tex_path,
+                ],
+                shell=False,
+                check=True,
+                cwd=fmt_dir,
+            )
+            os.replace(os.path.join(fmt_dir, f'{tmp_name}.fmt'), fmt_path)
+            delete_helper_files(os.path.join(fmt_dir, f'{tmp_name}.tex'))
+        return fmt_path
+    except Exception:
+        return None
+
+
+def tex2pdf_latexmk(source_path: str) -> None:
     print(source_path)
     args = [
-        'lualatex',
-        '--interaction=nonstopmode',
-        source_path,
+        'latexmk',
+        '-pdflua',
+        '-interaction=batchmode',
+        '-halt-on-error',
+        os.path.basename(source_path),
     ]
     try:
-        subprocess.run(args, shell=False, check=True)
+        subprocess.run(
+            args,
+            shell=False,
+            check=True,
+            cwd=os.path.dirname(source_path) or '.'
+        )
     except Exception as e:
         raise LuaLaTeXRuntimeError(source_path) from e
 
@@ -66,18 +329,18 @@ def tex2pdf(source_path: str) -> None:
 def parse_txt(s: str):
     """return a list of tuples (block_style, block_text)"""
     # replace soft linebreaks
-    s = re.sub(r'(\\{2}|\\par )[ ]*\r?\n', r' \1 ', s)
+    s = _RE_SOFT_BREAK.sub(r' \1 ', s)
 
     # split into blocks that do not contain newlines
     stripped_lines = (line.strip() for line in s.splitlines())
 
     for block in filter(None, stripped_lines):
         # detect the style of the block by the presence of starting `#`s
-        *style_match, p = re.split(r'^(#+)', block)
+        *style_match, p = _RE_STYLE.split(block)
 
         # if three or more `*`s on a line by themselves
         # it's a separator; no further action needed
-        if re.match(r'^\s*\*+$', p):
+        if _RE_SEPARATOR.match(p):
             yield 'separator', ''
             continue
 
@@ -85,40 +348,16 @@ def parse_txt(s: str):
         # convert \par to a proper line break
         # p = re.sub(r'\s*\\par\s+', '\n\n', p)
 
-        # escape spcial characters
-        p = re.sub(r'([&#%$])', r'\\\1', p)
-
-        # process annotations
-        p = re.sub(r'~~((?:[^~]|~[^~])+)~~', r'\\ntext{\1}', p)
-        p = re.sub(r' *<<((?:[^>]|>[^>])+)>> *', r'\\note{\1} ', p)
-
-        # process hyperlinks
-        p = re.sub(r'\[([^]]+)\]\(([^)]+)\)', r'\\href{\2}{\1}', p)
+        # escape special characters; process annotations and hyperlinks
+        p = _convert_tokens(p)
 
         # process bold and italic text
-        p = re.sub(r'\*\*((?:[^*]|\*[^*])+)\*\*', r'\\textbf{\1}', p)
-        p = re.sub(r'\*([^*]+)\*', r'\\emph{\1}', p)
-        # another pass to deal with nested cases
-        p = re.sub(r'\*\*((?:[^*]|\*[^*])+)\*\*', r'\\textbf{\1}', p)
-
-        # convert straight quotes to tex-style quotes
-        p = re.sub(r'(\s|\(|\{|^)"', r'\1``', p)
-        p = re.sub(r"(\s|\(|\{|^)'", r'\1`', p)
-        p = p.replace('"', "''")
+        p = _convert_emphasis(p)
 
-        # convert all quotes to tex-style quotes (for CJK compatibility)
-        p = p.replace('‘', '`').replace('’', "'")
-        p = p.replace('“', '``').replace('”', "''")
-
-        # use paddable dashes
-        p = re.sub(r'\s*(?:---|—)\s*|\s+(?:-|–)\s+', r'\\mdash ', p)
-        p = re.sub(r'\s*--\s*', r'\\ndash ', p)
-
-        # use custom ellipsis
-        p = re.sub(r'\s*(\.\.\.|…)\s*', r'\\ellipsis ', p)
-
-        # consolidate whitespace
-        p = re.sub(r'\s+', ' ', p).strip()
+        # convert quotes (straight and curly) to tex-style quotes,
+        # use paddable dashes and the custom ellipsis,
+        # and consolidate whitespace -- all in one pass
+        p = _convert_inline(p).strip()
 
         if not style_match:
             style = 'body'
@@ -140,9 +379,31 @@ def swap_ext(source_name: str, ext: str, base_only=False) -> str:
     return f'{root}.{ext}'
 
 
+def aux_needs_rerun(tex_path) -> bool:
+    """check whether the first pass left cross-reference state behind
+
+    labels and toc entries only resolve on a second run; a document
+    without them (the common case here) compiles fully in one pass
+    """
+    try:
+        with open(swap_ext(tex_path, 'aux'), 'rb') as f:
+            aux = f.read()
+    except OSError:
+        return False
+    return b'\\newlabel' in aux or b'\\@writefile' in aux
+
+
 def delete_helper_files(tex_path):
-    for ext in ['aux', 'log', 'out', 'synctex.gz']:
-        try:
-            os.remove(swap_ext(tex_path, ext))
-        except FileNotFoundError:
-            pass
+    # one directory scan instead of a stat+unlink attempt per extension
+    base = os.path.splitext(os.path.basename(tex_path))[0]
+    wanted = {
+        f'{base}.{ext}'
+        for ext in ('aux', 'log', 'out', 'synctex.gz', 'fls', 'fdb_latexmk')
+    }
+    try:
+        with os.scandir(os.path.dirname(tex_path) or '.') as it:
+            for entry in it:
+                if entry.name in wanted:
+                    os.unlink(entry.path)
+    except FileNotFoundError:
+        pass